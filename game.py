@@ -1,21 +1,30 @@
 import argparse
+import sys
 import random
+import socket
+import os
+import time
 import copy
 from typing import List
-from tqdm import trange
+from tqdm import trange, tqdm
 
 from helpers.constants import DIESIDE, VICTORY_PTS_WIN, DIE_COUNT, ENTER_TOKYO_PTS, START_TOKYO_PTS, MAX_ROLLS
 from agents import AVAILABLE_AGENTS
 from player import Player
 from helpers.report import GameLogger
+from helpers.results import ResultsStore, DEFAULT_RESULTS_DB, new_run_id
+from helpers.work_queue import WorkQueue, DEFAULT_LEASE_TIMEOUT, DEFAULT_MAX_ATTEMPTS, open_queue, start_queue_server
+from helpers.metrics import METRICS, start_metrics_server
+from helpers.dice import DiceStream
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 class Game:
-    def __init__(self, players=List[Player], start_idx=0, logger=None):
+    def __init__(self, players=List[Player], start_idx=0, logger=None, dice=None):
         self.players = players
+        self.dice = dice if dice is not None else DiceStream(seed=random.getrandbits(64))
         self.winner_idx = -1
         self.active_players = [True] * len(self.players)
         self.current_player_idx = start_idx
@@ -57,18 +66,19 @@ class Game:
             self.update_player_state(self.current_player, delta_vp=START_TOKYO_PTS)
             self.logger.log(f'{self.current_player} starts turn in Tokyo ({self.current_player.state})', category='warning')
 
-    def roll_n_dice(self, n=DIE_COUNT):
-        return [random.choice([DIESIDE.ATTACK, DIESIDE.HEAL, DIESIDE.ONE, DIESIDE.TWO, DIESIDE.THREE]) for _ in range(n)]
+    def roll_n_dice(self, n=DIE_COUNT, roll=0):
+        return self.dice.roll(self.turns, roll, n)
 
     def roll_dice(self):
         dice_results, keep_mask = [], []
         self.logger.log('\nStep 1: Rolling dice...', category='error')
 
         for i in range(MAX_ROLLS):
-            dice_results = [die for d, die in enumerate(dice_results) if keep_mask[d]] + self.roll_n_dice(DIE_COUNT - sum(keep_mask))
+            dice_results = [die for d, die in enumerate(dice_results) if keep_mask[d]] + self.roll_n_dice(DIE_COUNT - sum(keep_mask), roll=i)
             self.logger.log(f'roll {i + 1}: {[x.value for x in dice_results]}', category='warning')
             if i < MAX_ROLLS - 1:
                 keep_mask, keep_reason = self.current_player.keep_dice(copy.deepcopy(dice_results), {player.name: (player.idx, player.state) for player in self.other_players}, roll_counter=i)
+                METRICS.inc('tokyo_decisions_total', agent=self.current_player.name, action='keep_dice')
                 self.logger.log(f'keep {i + 1}: {keep_mask} (reason: {keep_reason})', category='success')
 
         return dice_results
@@ -98,6 +108,7 @@ class Game:
             if tokyo_player is not None:
                 self.update_player_state(tokyo_player, delta_health=-attack)
                 yield_decision, yield_reason = tokyo_player.yield_tokyo({player.name: (player.idx, player.state) for player in self.players if (player.idx != tokyo_player.idx)})
+                METRICS.inc('tokyo_decisions_total', agent=tokyo_player.name, action='yield_tokyo')
                 self.logger.log(f"{tokyo_player}'s yield decision: {yield_decision} (reason: {yield_reason})", category='success')
                 if yield_decision:
                     self.update_player_state(tokyo_player, in_tokyo=False)
@@ -143,31 +154,160 @@ class Game:
             self.enter_tokyo()
             self.check_winner()
             self.turns += 1
+            METRICS.record_turn()
         self.next_player()
 
 
+def play_game(player_names, game_id, start_idx, logger, seed):
+    random.seed(f'{seed}:{game_id}')
+    players = [AVAILABLE_AGENTS[player](idx=p, name=player) for p, player in enumerate(player_names)]
+    game = Game(players=players, start_idx=start_idx, logger=logger, dice=DiceStream(seed, game_id))
+    logger.start_game(game_id=game_id)
+    while game.winner_idx == -1:
+        game.step()
+    logger.end_game(winner_name=str(game.players[game.winner_idx]), turn_counts=game.turns)
+    METRICS.record_game(player_names, game.winner_idx)
+    for player in game.players:
+        logger.log(f'{player}: {player.state}', category='error' if game.is_player_dead(player) else 'success')
+    logger.log('\n\n\n', category='info')
+    return game
+
+
+def player_names_for(players):
+    return [f"p{p}_{player}" for p, player in enumerate(players)]
+
+
+def run_worker(queue, run_id=None, poll_interval=5):
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    n_played = 0
+    while True:
+        try:
+            job = queue.lease(worker_id, run_id=run_id)
+            progress = queue.progress(run_id) if job is None else None
+        except ConnectionError as e:
+            # a remote coordinator shuts its queue down once the run is collected
+            print(f"Worker {worker_id} stopping: {e}")
+            break
+        if job is None:
+            if progress['pending'] == 0 and progress['leased'] == 0:
+                break
+            # other workers still hold leases; wait in case one of them dies and its game is re-queued
+            time.sleep(poll_interval)
+            continue
+
+        logger = GameLogger(player_names=player_names_for(job['players']), total_games=1, report=job['report'])
+        try:
+            game = play_game(job['players'], job['game_id'], job['start_idx'], logger, job['seed'])
+        except Exception as e:
+            # e.g. an LLM provider error; release the game rather than taking the whole worker down
+            print(f"Worker {worker_id} failed game {job['game_id']} of run {job['run_id']}: {e!r}")
+            queue.fail(job, repr(e))
+            continue
+        queue.complete(job, {
+            'winner_idx': game.winner_idx,
+            'winner_name': str(game.players[game.winner_idx]),
+            'turns': game.turns,
+            'costs': [player.cost for player in game.players],
+            'game_log': logger.current_game_log,
+            'finished_at': time.time(),
+        })
+        n_played += 1
+    print(f"Worker {worker_id} played {n_played} games")
+
+
+def run_coordinator(queue, store, players, n_games, seed, logger, run_id=None, worker_queue=None, poll_interval=5):
+    if run_id is None:
+        run_id = new_run_id()
+    run_id = store.start_run(players, seed, n_games, run_id=run_id, host=socket.gethostname())
+    queue.enqueue(run_id, players, seed, n_games, report=logger.report)
+    print(f"Run {run_id} queued in {queue.path}; start workers with: python game.py --worker --queue {worker_queue or queue.path} --run_id {run_id}")
+
+    with tqdm(total=n_games) as pbar:
+        while True:
+            progress = queue.progress(run_id)
+            pbar.update(progress['done'] - pbar.n)
+            # stop on the queue's own state rather than a count, which may not match a resumed run
+            if progress['pending'] == 0 and progress['leased'] == 0:
+                break
+            time.sleep(poll_interval)
+
+    failures = queue.failures(run_id)
+    if failures:
+        print(f"Warning: {len(failures)} of {n_games} games failed after {queue.max_attempts} attempts and are left out of the report:")
+        for game_id, attempts, error in failures:
+            print(f"  game {game_id} ({attempts} attempts): {error}")
+
+    results = queue.results(run_id)
+    logger.total_games = len(results)
+    for result in results:
+        logger.add_game(result['winner_name'], result['turns'], game_log=result['game_log'])
+        store.add_game(run_id, result['game_id'], players, result['seed'], result['start_idx'], result['winner_idx'], result['turns'], costs=result['costs'], finished_at=result['finished_at'])
+    return run_id
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--players', '-p', nargs='+', choices=AVAILABLE_AGENTS.keys(), required=True, help='List of players (agent names) to participate in the game.')
-    parser.add_argument('--n_games', '-n', type=int, default=100)
+    parser.add_argument('--players', '-p', nargs='+', choices=AVAILABLE_AGENTS.keys(), help='List of players (agent names) to participate in the game.')
+    parser.add_argument('--n_games', '-n', type=int, default=None, help='Number of games (default 100).')
     parser.add_argument('--verbose', '-v', action='store_true', help='Print game logs.', default=False)
     parser.add_argument('--report', '-r', action='store_true', help='Generate game report.', default=False)
+    parser.add_argument('--seed', '-s', type=int, default=None, help='Run seed (random if not given). Runs with the same seed see the same dice, whatever the lineup.')
+    parser.add_argument('--db', default=DEFAULT_RESULTS_DB, help='SQLite results database every finished game is written to.')
+    parser.add_argument('--queue', '-q', default=None, help='SQLite work queue file, or a coordinator\'s http://host:port for --worker. With --players, queue the games and collect results from workers.')
+    parser.add_argument('--worker', '-w', action='store_true', help='Play games leased from --queue until it is drained.', default=False)
+    parser.add_argument('--run_id', default=None, help='Queue run to resume (coordinator, keeps its queued players, seed and n_games) or restrict to (worker).')
+    parser.add_argument('--queue_port', type=int, default=None, help='Coordinator only: serve the queue over HTTP on this port so workers on other machines can use it.')
+    parser.add_argument('--queue_host', default='0.0.0.0', help='Address the --queue_port server binds to.')
+    parser.add_argument('--lease_timeout', type=float, default=DEFAULT_LEASE_TIMEOUT, help='Seconds before a leased game is handed to another worker.')
+    parser.add_argument('--max_attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help='Leases a queued game gets before it is marked failed.')
+    parser.add_argument('--metrics_port', type=int, default=None, help='Serve live Prometheus metrics on http://127.0.0.1:PORT/metrics.')
     args = parser.parse_args()
 
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+
+    if args.worker:
+        assert args.queue is not None, '--worker requires --queue.'
+        queue = open_queue(args.queue, lease_timeout=args.lease_timeout, max_attempts=args.max_attempts)
+        run_worker(queue, run_id=args.run_id)
+        queue.close()
+        sys.exit(0)
+
+    queue, worker_queue = None, None
+    if args.queue is not None:
+        assert not args.queue.startswith(('http://', 'https://')), 'The coordinator needs a local --queue file; serve it to other machines with --queue_port.'
+        queue = WorkQueue(args.queue, lease_timeout=args.lease_timeout, max_attempts=args.max_attempts)
+        stored_run = queue.run_info(args.run_id) if args.run_id is not None else None
+        if stored_run is not None:
+            # a resumed run keeps the lineup, seed and size it was queued with, so every game in it shares the same dice stream
+            for name in ('players', 'seed', 'n_games'):
+                value = getattr(args, name)
+                assert value is None or value == stored_run[name], f'--{name} {value} conflicts with run {args.run_id}, which was queued with {stored_run[name]}.'
+                setattr(args, name, stored_run[name])
+        if args.queue_port is not None:
+            start_queue_server(args.queue, args.queue_port, host=args.queue_host, lease_timeout=args.lease_timeout, max_attempts=args.max_attempts)
+            worker_queue = f'http://{socket.gethostname()}:{args.queue_port}'
+    if args.n_games is None:
+        args.n_games = 100
+
+    assert args.players is not None, '--players is required.'
     assert len(args.players) >= 2, 'At least 2 players are required to play the game.'
     assert len(args.players) <= 6, 'At most 6 players are allowed to play the game.'
     if args.verbose:
-        assert args.n_games == 1, 'Verbose mode is only supported for single game.'
-
-    logger = GameLogger(player_names=[f"p{p}_{player}" for p, player in enumerate(args.players)], total_games=args.n_games, verbose=args.verbose, report=args.report)
-    for i in trange(args.n_games):
-        players = [AVAILABLE_AGENTS[player](idx=p, name=player) for p, player in enumerate(args.players)]
-        game = Game(players=players, start_idx=i % len(args.players), logger=logger)
-        logger.start_game(game_id=i)
-        while game.winner_idx == -1:
-            game.step()
-        logger.end_game(winner_name=str(game.players[game.winner_idx]), turn_counts=game.turns)
-        for player in game.players:
-            logger.log(f'{player}: {player.state}', category='error' if game.is_player_dead(player) else 'success')
-        logger.log('\n\n\n', category='info')
-    logger.generate_report()
+        assert args.n_games == 1 and args.queue is None, 'Verbose mode is only supported for single local game.'
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    logger = GameLogger(player_names=player_names_for(args.players), total_games=args.n_games, verbose=args.verbose, report=args.report)
+    with ResultsStore(args.db) as store:
+        if queue is not None:
+            run_id = run_coordinator(queue, store, args.players, args.n_games, seed, logger, run_id=args.run_id, worker_queue=worker_queue)
+            queue.close()
+        else:
+            run_id = store.start_run(args.players, seed, args.n_games, host=socket.gethostname())
+            for i in trange(args.n_games):
+                start_idx = i % len(args.players)
+                game = play_game(args.players, i, start_idx, logger, seed)
+                store.add_game(run_id, i, args.players, seed, start_idx, game.winner_idx, game.turns, costs=[player.cost for player in game.players])
+    print(f"Run {run_id} (seed {seed}) written to {args.db}")
+    if logger.total_games > 0:
+        logger.generate_report()
@@ -0,0 +1,48 @@
+import hashlib
+import struct
+
+from helpers.constants import DIESIDE, DIE_COUNT, MAX_ROLLS
+
+FACES = [DIESIDE.ATTACK, DIESIDE.HEAL, DIESIDE.ONE, DIESIDE.TWO, DIESIDE.THREE]
+# 255 = 51 * 5, so bytes below it map onto the faces without bias; 255 itself is skipped
+FACE_BY_BYTE = [FACES[b % len(FACES)] for b in range(255)]
+TURN_FACES = MAX_ROLLS * DIE_COUNT
+# one block covers a whole turn unless more than 64 - TURN_FACES of its bytes are 255; _turn_buffer() then draws another
+BLOCK_BYTES = 64
+
+
+class DiceStream:
+    """
+    Counter-based dice: the faces for a roll are a pure function of
+    (run seed, game id, turn, roll). One keyed BLAKE2b block is expanded into a
+    buffer holding every roll of a turn, and roll r reads its own slice of it.
+    The same seed gives every matchup the same dice, whatever the agents do
+    with `random`.
+    """
+
+    def __init__(self, seed, game_id=0):
+        self.seed = seed
+        self.game_id = game_id
+        key = hashlib.blake2b(str(seed).encode(), digest_size=32).digest()
+        self._hasher = hashlib.blake2b(key=key, digest_size=BLOCK_BYTES)
+        self._buffer_turn, self._buffer = None, None
+
+    def block(self, turn, counter=0):
+        hasher = self._hasher.copy()
+        hasher.update(struct.pack('<QII', self.game_id, turn, counter))
+        return [FACE_BY_BYTE[b] for b in hasher.digest() if b < 255]
+
+    def _turn_buffer(self, turn):
+        if self._buffer_turn != turn:
+            faces = self.block(turn)
+            counter = 1
+            while len(faces) < TURN_FACES:
+                faces += self.block(turn, counter)
+                counter += 1
+            self._buffer_turn, self._buffer = turn, faces
+        return self._buffer
+
+    def roll(self, turn, roll, n):
+        assert n <= DIE_COUNT and roll < MAX_ROLLS, f"Cannot roll {n} dice on roll {roll + 1}"
+        start = roll * DIE_COUNT
+        return self._turn_buffer(turn)[start:start + n]
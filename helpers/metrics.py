@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_WINDOW_SECONDS = 60
+WIN_RATE_Z = 1.96
+
+METRIC_DEFS = {
+    'tokyo_games_completed_total': ('counter', 'Games played to completion.'),
+    'tokyo_turns_total': ('counter', 'Turns played across all games.'),
+    'tokyo_decisions_total': ('counter', 'Decisions (keep_dice / yield_tokyo) made, per agent.'),
+    'tokyo_agent_games_total': ('counter', 'Games each agent has taken a seat in.'),
+    'tokyo_agent_wins_total': ('counter', 'Games each agent has won.'),
+    'tokyo_llm_requests_in_flight': ('gauge', 'LLM requests currently waiting on a provider.'),
+    'tokyo_llm_parse_failures_total': ('counter', 'LLM responses that could not be parsed into a move.'),
+    'tokyo_llm_call_latency_seconds': ('histogram', 'Wall time of LLM completion calls.'),
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+def wilson_interval(wins, games, z=WIN_RATE_Z):
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denom = 1 + z ** 2 / games
+    center = (p + z ** 2 / (2 * games)) / denom
+    margin = z * math.sqrt(p * (1 - p) / games + z ** 2 / (4 * games ** 2)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms for a benchmark run, rendered in
+    the Prometheus text format. Every update is a dict bump under one lock, so
+    it is cheap enough to leave on during full sweeps.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.values = {}
+        self.histograms = {}
+        self.recent_turns = deque()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            buckets, total = self.histograms.get(key, ([0] * len(LATENCY_BUCKETS), [0, 0.0]))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            total[0] += 1
+            total[1] += value
+            self.histograms[key] = (buckets, total)
+
+    def record_turn(self):
+        second = int(time.time())
+        with self.lock:
+            self.values[('tokyo_turns_total', ())] = self.values.get(('tokyo_turns_total', ()), 0) + 1
+            # per-second buckets keep the rate window bounded however fast games run
+            if self.recent_turns and self.recent_turns[-1][0] == second:
+                self.recent_turns[-1][1] += 1
+            else:
+                self.recent_turns.append([second, 1])
+                while self.recent_turns[0][0] <= second - RATE_WINDOW_SECONDS:
+                    self.recent_turns.popleft()
+
+    def record_game(self, agents, winner_seat):
+        self.inc('tokyo_games_completed_total')
+        for seat, agent in enumerate(agents):
+            self.inc('tokyo_agent_games_total', agent=agent)
+            if seat == winner_seat:
+                self.inc('tokyo_agent_wins_total', agent=agent)
+
+    @contextmanager
+    def time_llm_call(self, model):
+        self.inc('tokyo_llm_requests_in_flight', model=model)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc('tokyo_llm_requests_in_flight', -1, model=model)
+            self.observe('tokyo_llm_call_latency_seconds', time.perf_counter() - start, model=model)
+
+    def render(self):
+        now = time.time()
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: (list(buckets), list(total)) for key, (buckets, total) in self.histograms.items()}
+            recent_turns = sum(count for second, count in self.recent_turns if second > now - RATE_WINDOW_SECONDS)
+
+        lines = []
+        for name, (metric_type, help_text) in METRIC_DEFS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+            if metric_type == 'histogram':
+                for (key_name, labels), (buckets, (count, total)) in sorted(histograms.items()):
+                    if key_name != name:
+                        continue
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {bucket_count}')
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+            else:
+                for (key_name, labels), value in sorted(values.items()):
+                    if key_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        window = min(RATE_WINDOW_SECONDS, max(now - self.started_at, 1e-9))
+        lines += [
+            f'# HELP tokyo_turns_per_second Turns played per second over the last {RATE_WINDOW_SECONDS}s.',
+            '# TYPE tokyo_turns_per_second gauge',
+            f'tokyo_turns_per_second {recent_turns / window}',
+        ]
+
+        lines += [
+            '# HELP tokyo_win_rate Running win rate per agent, with 95% Wilson interval bounds in the bound label.',
+            '# TYPE tokyo_win_rate gauge',
+        ]
+        for (key_name, labels), games in sorted(values.items()):
+            if key_name != 'tokyo_agent_games_total':
+                continue
+            wins = values.get(('tokyo_agent_wins_total', labels), 0)
+            lower, upper = wilson_interval(wins, games)
+            lines.append(f'tokyo_win_rate{_format_labels(labels + (("bound", "estimate"),))} {wins / games}')
+            lines.append(f'tokyo_win_rate{_format_labels(labels + (("bound", "lower"),))} {lower}')
+            lines.append(f'tokyo_win_rate{_format_labels(labels + (("bound", "upper"),))} {upper}')
+
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -38,7 +38,8 @@ class GameLogger:
     def log(self, message, category='event', force_print=False):
         if self.verbose or force_print:
             print(COLORS[CATEGORY_COLORS[category]] + message + COLORS['RESET'])
-        if self.report:
+        # a coordinator only receives finished games from workers, so there may be no game being logged
+        if self.report and self.current_game_log is not None:
             if len(self.current_game_log['turns']) == 0:
                 self.current_game_log['turns'] = [{'turn_num': 0, 'events': []}]
             current_turn_events = self.current_game_log['turns'][-1]['events']
@@ -54,12 +55,17 @@ class GameLogger:
         if self.report:
             self.current_game_log['winner'] = winner_name
             self.current_game_log['turn_counts'] = turn_counts
-            self.game_logs.append(self.current_game_log)
         if self.verbose:
             self.log("\n\n----- Game ended -----", category='warning')
             self.log(f"Total turns: {turn_counts}", category='info')
             self.log(f"Winner: {winner_name}\n\n", category='success')
 
+        self.add_game(winner_name, turn_counts, game_log=self.current_game_log)
+
+    def add_game(self, winner_name, turn_counts, game_log=None):
+        # also used to fold in games played by remote workers
+        if self.report and game_log is not None:
+            self.game_logs.append(game_log)
         self.winners.append(winner_name)
         self.turn_counts.append(turn_counts)
 
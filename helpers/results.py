@@ -0,0 +1,186 @@
+import argparse
+import json
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+DEFAULT_RESULTS_DB = "./reports/results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    players TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    n_games INTEGER NOT NULL,
+    host TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    run_id TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    lineup TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    start_idx INTEGER NOT NULL,
+    winner_seat INTEGER NOT NULL,
+    winner_agent TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    cost REAL NOT NULL DEFAULT 0,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (run_id, game_id)
+);
+CREATE TABLE IF NOT EXISTS seats (
+    run_id TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    agent TEXT NOT NULL,
+    won INTEGER NOT NULL,
+    cost REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, game_id, seat)
+);
+CREATE INDEX IF NOT EXISTS idx_games_lineup ON games (lineup);
+CREATE INDEX IF NOT EXISTS idx_games_finished_at ON games (finished_at);
+CREATE INDEX IF NOT EXISTS idx_seats_agent ON seats (agent);
+"""
+
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+
+def lineup_key(players):
+    return ",".join(players)
+
+
+class ResultsStore:
+    """
+    SQLite store of finished games. Rows are buffered and flushed in a single
+    transaction every `batch_size` games (and on close), so a long sweep does
+    not pay one commit per game.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._games, self._seats = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_run(self, players, seed, n_games, run_id=None, host=None):
+        run_id = run_id or new_run_id()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, players, seed, n_games, host, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, json.dumps(list(players)), seed, n_games, host, time.time()),
+            )
+        return run_id
+
+    def add_game(self, run_id, game_id, players, seed, start_idx, winner_seat, turns, costs=None, finished_at=None):
+        costs = costs or [0.0] * len(players)
+        finished_at = finished_at if finished_at is not None else time.time()
+        self._games.append((run_id, game_id, lineup_key(players), seed, start_idx, winner_seat, players[winner_seat], turns, sum(costs), finished_at))
+        self._seats.extend((run_id, game_id, seat, agent, int(seat == winner_seat), costs[seat]) for seat, agent in enumerate(players))
+        if len(self._games) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._games:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._games)
+            self.conn.executemany("INSERT OR REPLACE INTO seats VALUES (?, ?, ?, ?, ?, ?)", self._seats)
+        self._games, self._seats = [], []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def merge(self, shard_path):
+        """
+        Copies every run/game/seat from another results db into this one. Runs
+        are keyed by a random run id, so shards from different machines never
+        collide and merging the same shard twice is a no-op.
+        """
+        # ATTACH would silently create an empty db for a mistyped path
+        if not Path(shard_path).is_file():
+            raise FileNotFoundError(f"No results database at {shard_path}")
+        self.flush()
+        self.conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+        try:
+            with self.conn:
+                counts = {}
+                for table in ("runs", "games", "seats"):
+                    cursor = self.conn.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM shard.{table}")
+                    counts[table] = cursor.rowcount
+        finally:
+            self.conn.execute("DETACH DATABASE shard")
+        return counts
+
+    def win_rates(self, run_ids=None, lineup=None, agents=None, since=None):
+        where, params = [], []
+        if run_ids:
+            where.append(f"g.run_id IN ({', '.join('?' * len(run_ids))})")
+            params.extend(run_ids)
+        if lineup:
+            where.append("g.lineup = ?")
+            params.append(lineup_key(lineup))
+        if agents:
+            where.append(f"s.agent IN ({', '.join('?' * len(agents))})")
+            params.extend(agents)
+        if since is not None:
+            where.append("g.finished_at >= ?")
+            params.append(since)
+
+        self.flush()
+        query = f"""
+            SELECT s.agent, COUNT(*) AS games, SUM(s.won) AS wins, AVG(g.turns) AS avg_turns, SUM(s.cost) AS cost
+            FROM seats s JOIN games g ON g.run_id = s.run_id AND g.game_id = s.game_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY s.agent
+            ORDER BY 1.0 * SUM(s.won) / COUNT(*) DESC
+        """
+        return [
+            {'agent': agent, 'games': games, 'wins': wins, 'win_rate': wins / games, 'avg_turns': avg_turns, 'cost': cost}
+            for agent, games, wins, avg_turns, cost in self.conn.execute(query, params)
+        ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query and merge tokyo-bench results databases.')
+    parser.add_argument('--db', default=DEFAULT_RESULTS_DB, help='Results database to read from / merge into.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help='Aggregate win rates over a subset of stored games.')
+    report_parser.add_argument('--run_id', nargs='+', default=None, help='Only include these runs.')
+    report_parser.add_argument('--lineup', nargs='+', default=None, help='Only include games with exactly this seat order of agents.')
+    report_parser.add_argument('--agents', nargs='+', default=None, help='Only report these agents.')
+    report_parser.add_argument('--since_days', type=float, default=None, help='Only include games finished in the last N days.')
+
+    merge_parser = subparsers.add_parser('merge', help='Merge results shards from other machines into --db.')
+    merge_parser.add_argument('shards', nargs='+')
+
+    args = parser.parse_args()
+    if args.command == 'merge':
+        missing = [shard for shard in args.shards if not Path(shard).is_file()]
+        if missing:
+            parser.error(f"no results database at: {', '.join(missing)}")
+
+    with ResultsStore(args.db) as store:
+        if args.command == 'merge':
+            for shard in args.shards:
+                counts = store.merge(shard)
+                print(f"{shard}: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+        elif args.command == 'report':
+            since = time.time() - args.since_days * 86400 if args.since_days is not None else None
+            rows = store.win_rates(run_ids=args.run_id, lineup=args.lineup, agents=args.agents, since=since)
+            print(f"{'agent':<20} {'games':>8} {'wins':>8} {'win rate':>9} {'avg turns':>10} {'cost':>10}")
+            for row in rows:
+                print(f"{row['agent']:<20} {row['games']:>8} {row['wins']:>8} {row['win_rate']:>9.2%} {row['avg_turns']:>10.2f} {row['cost']:>10.4f}")
@@ -0,0 +1,222 @@
+import json
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+DEFAULT_LEASE_TIMEOUT = 30 * 60
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    players TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    start_idx INTEGER NOT NULL,
+    report INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (run_id, game_id)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires);
+"""
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of games. Workers lease one game at a time; a lease
+    that is not completed within `lease_timeout` seconds (e.g. the worker
+    crashed) makes the game available to other workers again. A game that has
+    been leased `max_attempts` times without finishing is marked failed.
+    The SQLite file is only safe on one host; workers on other machines reach
+    it through start_queue_server() and RemoteWorkQueue.
+    """
+
+    def __init__(self, path, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # the queue server opens the queue on the main thread and serves it from its own thread
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # WAL needs shared memory on one host, so keep the rollback journal; writers serialize on BEGIN IMMEDIATE
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, run_id, players, seed, n_games, report=False):
+        rows = [(run_id, i, json.dumps(list(players)), seed, i % len(players), int(report)) for i in range(n_games)]
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany("INSERT OR IGNORE INTO jobs (run_id, game_id, players, seed, start_idx, report) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.execute("COMMIT")
+
+    def lease(self, worker_id, run_id=None):
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never lease the same game
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired' WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = self.conn.execute(
+                f"""SELECT run_id, game_id, players, seed, start_idx, report FROM jobs
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) {'AND run_id = ?' if run_id else ''}
+                ORDER BY attempts, game_id LIMIT 1""",
+                (now, run_id) if run_id else (now,),
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE run_id = ? AND game_id = ?",
+                    (worker_id, now + self.lease_timeout, row[0], row[1]),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        run_id, game_id, players, seed, start_idx, report = row
+        return {'run_id': run_id, 'game_id': game_id, 'players': json.loads(players), 'seed': seed, 'start_idx': start_idx, 'report': bool(report), 'worker_id': worker_id}
+
+    def complete(self, job, result):
+        # a late result from a worker whose lease expired is still accepted while the game is leased (possibly re-leased),
+        # but never once it is done or has been marked failed
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL WHERE run_id = ? AND game_id = ? AND status = 'leased'",
+            (json.dumps(result), job['run_id'], job['game_id']),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job, error):
+        # hand the game straight back instead of waiting for the lease to expire, unless it has used up its attempts;
+        # a worker whose lease expired must not release a game another worker has since leased
+        self.conn.execute(
+            """UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, lease_owner = NULL, lease_expires = NULL
+            WHERE run_id = ? AND game_id = ? AND status = 'leased' AND lease_owner = ?""",
+            (self.max_attempts, error, job['run_id'], job['game_id'], job['worker_id']),
+        )
+
+    def run_info(self, run_id):
+        row = self.conn.execute("SELECT players, seed, COUNT(*), MAX(report) FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        if row[2] == 0:
+            return None
+        players, seed, n_games, report = row
+        return {'players': json.loads(players), 'seed': seed, 'n_games': n_games, 'report': bool(report)}
+
+    def progress(self, run_id=None):
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        query = "SELECT status, COUNT(*) FROM jobs" + (" WHERE run_id = ?" if run_id else "") + " GROUP BY status"
+        for status, count in self.conn.execute(query, (run_id,) if run_id else ()):
+            counts[status] = count
+        return counts
+
+    def results(self, run_id):
+        return [
+            {'game_id': game_id, 'seed': seed, 'start_idx': start_idx, **json.loads(result)}
+            for game_id, seed, start_idx, result in self.conn.execute("SELECT game_id, seed, start_idx, result FROM jobs WHERE run_id = ? AND status = 'done' ORDER BY game_id", (run_id,))
+        ]
+
+    def failures(self, run_id):
+        return self.conn.execute("SELECT game_id, attempts, error FROM jobs WHERE run_id = ? AND status = 'failed' ORDER BY game_id", (run_id,)).fetchall()
+
+
+class RemoteWorkQueue:
+    """
+    Worker-side view of a queue served by a coordinator's start_queue_server(),
+    with the same lease / complete / fail / progress calls as WorkQueue.
+    """
+
+    def __init__(self, url, timeout=60, retries=3):
+        self.path = url
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+
+    def close(self):
+        pass
+
+    def _request(self, endpoint, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url + endpoint, data=data, headers={'Content-Type': 'application/json'})
+        for attempt in range(self.retries):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read())
+            except (urllib.error.URLError, ConnectionError) as e:
+                # a coordinator that is briefly unreachable should not cost a finished game
+                if attempt == self.retries - 1:
+                    raise ConnectionError(f"Work queue at {self.url} is unreachable: {getattr(e, 'reason', e)}") from e
+                time.sleep(2 ** attempt)
+
+    def lease(self, worker_id, run_id=None):
+        return self._request('/lease', {'worker_id': worker_id, 'run_id': run_id})
+
+    def complete(self, job, result):
+        return self._request('/complete', {'job': job, 'result': result})
+
+    def fail(self, job, error):
+        self._request('/fail', {'job': job, 'error': error})
+
+    def progress(self, run_id=None):
+        return self._request('/progress' + (f'?{urllib.parse.urlencode({"run_id": run_id})}' if run_id else ''))
+
+
+class _QueueHandler(BaseHTTPRequestHandler):
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path != '/progress':
+            self.send_error(404)
+            return
+        run_id = urllib.parse.parse_qs(query).get('run_id', [None])[0]
+        self._send_json(self.server.queue.progress(run_id))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        queue = self.server.queue
+        if self.path == '/lease':
+            self._send_json(queue.lease(body['worker_id'], run_id=body.get('run_id')))
+        elif self.path == '/complete':
+            self._send_json(queue.complete(body['job'], body['result']))
+        elif self.path == '/fail':
+            queue.fail(body['job'], body['error'])
+            self._send_json(None)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_queue_server(path, port, host='0.0.0.0', lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    # single-threaded on purpose: requests are tiny and every one of them goes through the same SQLite connection
+    server = HTTPServer((host, port), _QueueHandler)
+    server.queue = WorkQueue(path, lease_timeout=lease_timeout, max_attempts=max_attempts)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def open_queue(spec, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    if spec.startswith(('http://', 'https://')):
+        return RemoteWorkQueue(spec)
+    return WorkQueue(spec, lease_timeout=lease_timeout, max_attempts=max_attempts)
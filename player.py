@@ -5,7 +5,8 @@ from typing import List, Dict, Tuple
 from pydantic import BaseModel, Field
 from helpers.constants import MAX_HEALTH, VICTORY_PTS_WIN, DIESIDE
 from llm.helpers import ACTIONS, get_llm_request_args
-from litellm import completion
+from helpers.metrics import METRICS
+from litellm import completion, completion_cost
 
 
 class PlayerState(BaseModel):
@@ -22,6 +23,7 @@ class Player(ABC):
         self.max_victory_points = VICTORY_PTS_WIN
         self.min_health = 0
         self.min_victory_points = 0
+        self.cost = 0.0
         self.reset()
 
     @property
@@ -81,9 +83,18 @@ class Player(ABC):
             gamestate['roll_counter'] = roll_counter + 1
 
         messages, tools, tool_choice = get_llm_request_args(action, gamestate, tool_use)
-        response = completion(model=model, messages=messages, tools=tools, tool_choice=tool_choice)
+        with METRICS.time_llm_call(model):
+            response = completion(model=model, messages=messages, tools=tools, tool_choice=tool_choice)
+        try:
+            self.cost += completion_cost(completion_response=response)
+        except Exception:
+            pass  # litellm has no pricing for this model
         if tool_use:
-            llm_response = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            try:
+                llm_response = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            except Exception:
+                METRICS.inc('tokyo_llm_parse_failures_total', model=model)
+                raise
             if action == ACTIONS.KEEP_DICE:
                 assert len(llm_response["keep_mask"]) == len(dice_results), f"Expected mask of length {len(dice_results)}, got {len(llm_response["keep_mask"])}"
                 return llm_response["keep_mask"], llm_response["reason"]
@@ -95,6 +106,7 @@ class Player(ABC):
                 move = json.loads(re.findall(r'<move>(.*?)</move>', llm_response)[0].lower())
                 reason = ''.join(re.findall(r'<reason>(.*?)</reason>', llm_response))
             except Exception as e:
+                METRICS.inc('tokyo_llm_parse_failures_total', model=model)
                 print(f"Error parsing LLM response: {e}")
                 print(llm_response)
                 move, reason = None, None